@@ -0,0 +1,54 @@
+"""
+This module contains a function (cancel_order) to cancel a working order by its order ID.
+"""
+from ib_async import *
+import time
+from ib_connection import get_ib
+
+def cancel_order(order_id: int, ib: IB = None, timeout: float = 3.0) -> bool:
+    """
+    Cancels the working order with the given order ID and waits for TWS to
+    confirm the cancellation.
+
+    Parameters
+    ----------
+    order_id: Order ID of the order to cancel
+    ib: Interactive Brokers object - default None; the shared connection is used if not given
+    timeout: Maximum seconds to wait for the cancellation to be confirmed
+
+    Returns
+    ----------
+    True if the order was found and the cancellation confirmed, False otherwise
+    """
+    if ib is None:
+        ib = get_ib()
+
+    orders_by_id = {order.orderId: order for order in ib.orders()}
+    order = orders_by_id.get(order_id)
+
+    if order is None:
+        return False
+
+    trade = ib.cancelOrder(order)
+
+    # Return as soon as TWS confirms instead of sleeping a fixed second
+    deadline = time.monotonic() + timeout
+
+    while trade.orderStatus.status not in ('Cancelled', 'ApiCancelled'):
+        remaining = deadline - time.monotonic()
+
+        if remaining <= 0:
+            return False
+
+        ib.waitOnUpdate(timeout=remaining)
+
+    return True
+
+
+## For testing:
+def main() -> None:
+    cancelled = cancel_order(1)
+    print(f"cancelled = {cancelled}")
+
+if __name__ == '__main__':
+    main()
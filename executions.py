@@ -1,7 +1,8 @@
 """
 This module reports sell or buy executions.
 """
-from ib_insync import *
+from ib_async import *
+from ib_connection import get_ib
 
 def get_executions(ib: IB) -> list:
     """
@@ -36,16 +37,13 @@ def get_executions(ib: IB) -> list:
 
 
 def main() -> None:
-    # Connect to IB
-    ib = IB()
-    ib.connect('127.0.0.1', 7497, clientId=1)
+    # Use the shared IB connection
+    ib = get_ib()
 
     executions = get_executions(ib)
 
     for order in executions:
         print(order)
 
-    ib.disconnect()
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,109 +3,222 @@ This module contains a function to find a 0DTE put spread and
 a 0DTE call spread for the SPXW that matches the given width
 and has mid-price matching the given entry credit
 """
-from ib_insync import *
+from ib_async import *
 from datetime import date
+import asyncio
+import logging
+import numpy as np
+from ib_connection import get_ib
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+except ImportError:     # Numba is optional; the kernel also runs as plain Python/NumPy
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+# Qualified contracts keyed by (expiration, strike, right), so repeat calls to
+# get_spreads only round-trip to TWS for strikes not seen before
+_qualify_cache: dict[tuple, Contract] = {}
+
+def _qualify_options(ib: IB, contracts: list[Option]) -> list[Contract]:
+    """
+    Helper function that qualifies option contracts through a module-level
+    cache, only sending the contracts TWS has not resolved yet.
 
-def find_closest_midspread(market_price: float, spreads: list[tuple], right: str, saftey_zone: float = 0) -> tuple:
+    Parameters
+    ----------
+    ib: Interactive Brokers object
+    contracts: Option contracts to qualify
+
+    Returns
+    ----------
+    List of qualified contracts
+    """
+    key = lambda c: (c.lastTradeDateOrContractMonth, c.strike, c.right)
+
+    needed = [c for c in contracts if key(c) not in _qualify_cache]
+
+    for contract in ib.qualifyContracts(*needed):
+        _qualify_cache[key(contract)] = contract
+
+    return [_qualify_cache[key(c)] for c in contracts if key(c) in _qualify_cache]
+
+
+async def _req_spx_and_chains(ib: IB, spx: Index) -> tuple:
+    """
+    Helper coroutine that requests the SPX ticker and the option chain
+    parameters concurrently, since the two round trips are independent.
+
+    Parameters
+    ----------
+    ib: Interactive Brokers object
+    spx: Qualified SPX index contract
+
+    Returns
+    ----------
+    Tuple of (SPX ticker, option chains)
+    """
+    tickers, chains = await asyncio.gather(
+        ib.reqTickersAsync(spx),
+        ib.reqSecDefOptParamsAsync(spx.symbol, '', spx.secType, spx.conId)
+    )
+
+    return tickers[0], chains
+
+
+async def _req_option_tickers(ib: IB, contracts: list[Contract], chunk_size: int = 50) -> list[Ticker]:
+    """
+    Helper coroutine that requests tickers for the option contracts in
+    concurrent chunks so the network latency overlaps.
+
+    Parameters
+    ----------
+    ib: Interactive Brokers object
+    contracts: Qualified option contracts
+    chunk_size: Number of contracts per request
+
+    Returns
+    ----------
+    List of tickers, in the same order as the contracts
+    """
+    chunks = [contracts[i:i + chunk_size] for i in range(0, len(contracts), chunk_size)]
+
+    results = await asyncio.gather(*[ib.reqTickersAsync(*chunk) for chunk in chunks])
+
+    return [ticker for chunk in results for ticker in chunk]
+
+
+# Structured record layout shared by find_spreads_in_list and its consumers
+SPREAD_DTYPE = np.dtype([('short', 'f8'), ('long', 'f8'), ('mid', 'f8')])
+
+def find_closest_midspread(market_price: float, spreads: np.ndarray, right: str, saftey_zone: float = 0) -> tuple:
     """
     Helper function that returns the closest spread strike prices to the market price.
     Returns None if no spreads found.
 
     :param market_price: Current market price of SPX
-    :param spreads: List of spreads
+    :param spreads: Structured array of spreads (SPREAD_DTYPE)
     :param right: "P" for put, "C" for call
     :param saftey_zone: Buffer between market price and closest spread
     """
-    valid_spreads: list = []
-
-    for spread in spreads:
-        strike1: float = spread[0]
-        strike2: float = spread[1]
-
-        if right == "P":    # Put
-            # Check if strike prices are below market price
-            if strike1 < (market_price-saftey_zone) and strike2 < (market_price-saftey_zone):
-                valid_spreads.append(spread)
-
-        elif right == "C":   # Call
-            # Check if strike prices are above market price
-            if strike1 > (market_price+saftey_zone) and strike2 > (market_price+saftey_zone):
-                valid_spreads.append(spread)
-        
-        else:
-            raise SyntaxError("P for put, C for call")
-
-    print(f"Market price: {market_price}")
-    print(f"Valid Spreads: {valid_spreads}")
-
-    try:
-        return valid_spreads[0]
-    except IndexError:
+    if right not in ("P", "C"):
+        raise SyntaxError("P for put, C for call")
+
+    if not len(spreads):
+        return None
+
+    if right == "P":    # Put
+        # Check if strike prices are below market price
+        mask = (spreads['short'] < (market_price - saftey_zone)) & (spreads['long'] < (market_price - saftey_zone))
+    else:               # Call
+        # Check if strike prices are above market price
+        mask = (spreads['short'] > (market_price + saftey_zone)) & (spreads['long'] > (market_price + saftey_zone))
+
+    logger.debug("Market price: %s", market_price)
+
+    if not mask.any():
         return None
+
+    # First valid spread in the given order
+    spread = spreads[int(np.argmax(mask))]
+
+    return (float(spread['short']), float(spread['long']), float(spread['mid']))
                 
 
-def find_spreads(tickers: list[Ticker], width: float, entry_credit: float) -> tuple:
+def ticker_arrays(tickers: list[Ticker]) -> tuple:
     """
-    Function that finds
+    Function that converts a list of tickers to SoA arrays (strikes, mids, rights)
 
-    :param tickers:
-    :param width:
-    :param entry_credit: 
+    :param tickers: List of tickers
     """
-    
-    # Create ticker lists
-    call_tickers = [t for t in tickers if t.contract.right == 'C']
-    put_tickers = [t for t in tickers if t.contract.right == 'P']
+    n = len(tickers)
 
+    strikes = np.fromiter((ticker.contract.strike for ticker in tickers), dtype=np.float64, count=n)
+    bids = np.fromiter((ticker.bid for ticker in tickers), dtype=np.float64, count=n)
+    asks = np.fromiter((ticker.ask for ticker in tickers), dtype=np.float64, count=n)
+    rights = np.fromiter((ticker.contract.right for ticker in tickers), dtype='U1', count=n)
 
-    call_spreads = find_spreads_in_list(call_tickers, 'call', width, entry_credit)
-    put_spreads = find_spreads_in_list(put_tickers, 'put', width, entry_credit)
+    return strikes, 0.5 * (bids + asks), rights
 
-    return call_spreads, put_spreads
 
+def find_spreads(strikes: np.ndarray, mids: np.ndarray, rights: np.ndarray, width: float, entry_credit: float) -> tuple:
+    """
+    Function that finds call and put spreads from SoA ticker arrays
 
-def mid_price(ticker: Ticker) -> float:
-        """
-        Function that returns the midprice of an option
+    :param strikes: Strike prices
+    :param mids: Mid prices
+    :param rights: 'C'/'P' per ticker
+    :param width:
+    :param entry_credit:
+    """
+    calls = rights == 'C'
+    puts = rights == 'P'
 
-        :param ticker:
-        """
-        print(f"ticker.contract.right={ticker.contract.right}")
-        print(f"ticker.contract.strike={ticker.contract.strike}")
-        print(f"ticker.bid={ticker.bid}")
-        print(f"ticker.ask={ticker.ask}")
-        
-        return (ticker.bid + ticker.ask) / 2
+    call_spreads = find_spreads_in_list(strikes[calls], mids[calls], 'call', width, entry_credit)
+    put_spreads = find_spreads_in_list(strikes[puts], mids[puts], 'put', width, entry_credit)
+
+    return call_spreads, put_spreads
 
 
-def find_spreads_in_list(ticker_list: list[Ticker], right: str, width: float, entry_credit: float):
+def find_spreads_in_list(strikes: np.ndarray, mids: np.ndarray, right: str, width: float, entry_credit: float) -> np.ndarray:
         """
-        Helper function that finds all 
+        Helper function that finds all
         """
-        spreads = []
-        ticker_dict = {ticker.contract.strike: ticker for ticker in ticker_list}
+        if not len(strikes):
+            return np.empty(0, dtype=SPREAD_DTYPE)
+
+        # Sort by strike once so the kernel can binary-search partners
+        order = np.argsort(strikes)
+        strikes = strikes[order]
+        mids = mids[order]
+
+        signed_width = width if right == 'call' else -width
+        short_strikes, long_strikes, spread_mids = _scan_spreads(strikes, mids, signed_width, entry_credit)
+
+        spreads = np.empty(len(short_strikes), dtype=SPREAD_DTYPE)
+        spreads['short'] = short_strikes
+        spreads['long'] = long_strikes
+        spreads['mid'] = spread_mids
+
+        return spreads
 
-        for short_strike in ticker_dict:
-            if right == 'call':
-                long_strike = short_strike + width
-            else:  # 'put'
-                long_strike = short_strike - width
 
-            if long_strike in ticker_dict:
-                short_mid = mid_price(ticker_dict[short_strike])
-                long_mid = mid_price(ticker_dict[long_strike])
-                spread_mid = short_mid - long_mid
+@njit(cache=True)
+def _scan_spreads(strikes, mids, signed_width, entry_credit):
+        """
+        Numeric kernel for find_spreads_in_list: two-pointer sweep over the
+        sorted strike array that pairs each short strike with the long strike
+        at strike + signed_width (negative width for puts).  JIT-compiled by
+        Numba when it is installed.
+        """
+        n = len(strikes)
+        short_out = np.empty(n, dtype=np.float64)
+        long_out = np.empty(n, dtype=np.float64)
+        mid_out = np.empty(n, dtype=np.float64)
 
-                spread_mid_rounded = round(spread_mid, 2)
+        count = 0
+        for i in range(n):
+            long_strike = strikes[i] + signed_width
 
-                print(f"spread_mid, entry_credit = {spread_mid_rounded}, {entry_credit}")
+            # Binary search for the long leg (strikes is sorted)
+            j = np.searchsorted(strikes, long_strike)
+            if j < n and strikes[j] == long_strike:
+                spread_mid = round(mids[i] - mids[j], 2)
 
                 # Ensure that the spread_mid is a credit and meets the minimum entry_credit
-                if spread_mid_rounded >= entry_credit:
-                    spreads.append((short_strike, long_strike, spread_mid_rounded))
-        return spreads
+                if spread_mid >= entry_credit:
+                    short_out[count] = strikes[i]
+                    long_out[count] = long_strike
+                    mid_out[count] = spread_mid
+                    count += 1
 
-def get_spreads(width: float, time, entry_credit: float, nof_lot: int, upper_profit_zone: float = 0, lower_profit_zone: int = 0) -> tuple[tuple]:
+        return short_out[:count], long_out[:count], mid_out[:count]
+
+def get_spreads(width: float, time, entry_credit: float, nof_lot: int, upper_profit_zone: float = 0, lower_profit_zone: int = 0, ib: IB = None) -> tuple[tuple]:
     """
     Main function that returns 0DTE put spread and a 0DTE 
     call spread for the SPX that matches the given width
@@ -119,15 +232,16 @@ def get_spreads(width: float, time, entry_credit: float, nof_lot: int, upper_pro
     time: Time to execute trade
     entry_credit: entry credit
     nof_lot: number of lots
+    ib: Interactive Brokers object - default None; the shared connection is used if not given
 
     Returns
     ----------
     Tuple of spread strike prices
     """
 
-    # Initialize IB connection
-    ib = IB()
-    ib.connect('127.0.0.1', 7497, clientId=1)
+    # Use the shared IB connection unless one was passed in
+    if ib is None:
+        ib = get_ib()
 
     # Create contract for SPX
     spx = Index('SPX', 'CBOE')
@@ -136,26 +250,20 @@ def get_spreads(width: float, time, entry_credit: float, nof_lot: int, upper_pro
     # Get current data
     ib.reqMarketDataType(1)
 
-    # Get SPX market price
-    [ticker] = ib.reqTickers(spx)
-    print(f"\nticker={ticker}\n")
+    # Get SPX market price and option chains (overlapped round trips)
+    ticker, chains = ib.run(_req_spx_and_chains(ib, spx))
     spx_value = ticker.marketPrice()
-    print(f"spx_value={spx_value}\n")
-
-    # Get option chains
-    chains = ib.reqSecDefOptParams(spx.symbol, '', spx.secType, spx.conId)
-    print("Option Chains: ")
-    print(util.df(chains))
+    logger.debug("spx_value=%s", spx_value)
 
     # Get SPXW trading on SMART
     chain = next(c for c in chains if c.tradingClass == 'SPXW' and c.exchange == 'SMART')
-    print(f"\nchain={chain}\n")
+    logger.debug("chain=%s", chain)
 
     # Filter strikes within ±10 times the width points of the SPX value
     strikes = [strike for strike in chain.strikes if strike % 5 == 0 and (spx_value - 10*width) < strike < (spx_value + 10*width)]
     expiration = date.today().strftime('%Y%m%d')
     rights = ['P', 'C']
-    print(f"\nFiltered strikes = {strikes}\n")
+    logger.debug("Filtered strikes = %s", strikes)
 
     #expirations = sorted(exp for exp in chain.expirations)[:1]
     #print(f"\nexpiration = {expirations}\n")
@@ -165,46 +273,37 @@ def get_spreads(width: float, time, entry_credit: float, nof_lot: int, upper_pro
                 for right in rights
                 for strike in strikes]
 
-    # Qualify contracts
-    print("--- before ib.qualifyContracts ---")
-    contracts = ib.qualifyContracts(*contracts)
-    print("--- after ib.qualifyContracts ---")
+    # Qualify contracts (cached across calls)
+    contracts = _qualify_options(ib, contracts)
 
-    print(f"\nNumber of contracts = {len(contracts)}\n")
-    print("Contracts: ")
-    print(*contracts, sep = "\n")
+    logger.debug("Number of contracts = %d", len(contracts))
 
-    # Request tickers for all options
-    tickers = ib.reqTickers(*contracts)
-    print("\nTickers:")
-    print(*tickers, sep = "\n")
+    # Request tickers for all options in concurrent chunks
+    tickers = ib.run(_req_option_tickers(ib, contracts))
 
-    # Use the function to find the spreads
-    short_call_strikes, short_put_strikes = find_spreads(tickers, width, entry_credit)
-    print(f"Short Call Strikes: {short_call_strikes}")
-    print(f"Short Put Strikes: {short_put_strikes}")
+    # Build SoA arrays once from the tickers and use them to find the spreads
+    strike_arr, mid_arr, right_arr = ticker_arrays(tickers)
+    short_call_strikes, short_put_strikes = find_spreads(strike_arr, mid_arr, right_arr, width, entry_credit)
 
-    short_call_strikes.sort(key=lambda x: x[2])
-    short_put_strikes.sort(key=lambda x: x[2])
-    print("====================")
-    print(f"\nSorted Short Call Strikes closest to entry_credit: {short_call_strikes}")
-    print(f"\nSorted Put Strikes closest to entry_credit: {short_put_strikes}")
-    print("====================")
+    short_call_strikes = short_call_strikes[np.argsort(short_call_strikes['mid'])]
+    short_put_strikes = short_put_strikes[np.argsort(short_put_strikes['mid'])]
+    logger.debug("Sorted Short Call Strikes closest to entry_credit: %s", short_call_strikes)
+    logger.debug("Sorted Put Strikes closest to entry_credit: %s", short_put_strikes)
 
     closest_call_spread = find_closest_midspread(market_price=spx_value, spreads=short_call_strikes, right="C", saftey_zone=upper_profit_zone)
     closest_put_spread = find_closest_midspread(market_price=spx_value, spreads=short_put_strikes, right="P", saftey_zone=lower_profit_zone)
 
-    print(f"\nMarket price: {spx_value}")
-    print(f"Closest call: {closest_call_spread}")
-    print(f"Closest put:  {closest_put_spread}")
-
-    ib.disconnect()
+    logger.debug("Market price: %s", spx_value)
+    logger.debug("Closest call: %s", closest_call_spread)
+    logger.debug("Closest put:  %s", closest_put_spread)
 
     return closest_call_spread, closest_put_spread
 
 
 ## For testing:
 def main() -> None:
+    logging.basicConfig(level=logging.DEBUG)
+
     width = 10              # Spread width
     entry_credit = 1        # Entry credit
     nof_lot = 1             # Number of lots
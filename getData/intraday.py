@@ -1,12 +1,21 @@
 """
 This module fetches data (bid, ask) of traded 0DTE intraday options data for the SPX.
 """
-from ib_insync import *
+from ib_async import *
 from datetime import datetime, timedelta
+import asyncio
+import csv
+import numpy as np
+import os
 import struct
+import threading
 import time
+from collections import deque
+from record import RECORD_STRUCT, RECORD_DTYPE, FILE_HEADER, PUT_FLAG, ASK_FLAG, price_to_cents
 
 FILENAME: str = 'intraday.bin'
+MAX_IN_FLIGHT: int = 50     # Concurrent historical data requests, sized to IB's pacing budget
+NUM_OF_CONNECTIONS: int = 4 # IB pacing is per client connection, so shard the strikes across several
 
 def get_open_price(ib: IB, date: datetime = datetime.now()) -> float:
     """
@@ -43,45 +52,266 @@ def get_open_price(ib: IB, date: datetime = datetime.now()) -> float:
     return opening_price
 
 
-def get_data(ib: IB, strike: float, right: str, interval_end_time: datetime = None, date: datetime = datetime.now()):
+def build_contracts(ib: IB, strikes, date: datetime = datetime.now()) -> dict:
     """
-    Generator that yields the bid/ask prices for a 0DTE option.
+    Function that builds and qualifies the option contracts for all strikes
+    and rights once per date, so the fetch loops reuse them instead of
+    constructing (and resolving) a contract per request.
 
     Parameters
     ----------
     ib: Interactive brokers object
-    strike: Strike price
-    right: 'C' or 'P'
+    strikes: Strike prices to build contracts for
     date: Date of option expiry (today by default)
 
     Returns
     ----------
-    List of data [timestamp, strike price, right, bid, ask]
+    Dict mapping (strike, right) to the qualified Option contract
     """
     formatted_date: str = date.strftime("%Y%m%d")      # Using this function inside Option constructor does not work for some reason...
 
-    if interval_end_time is None:   
-        end_time: str = formatted_date + ' 16:00:00'
-    else:
-        end_time: str = formatted_date + interval_end_time.strftime(' %H:%M:%S')
-
-    contract = Option(
-        symbol='SPX', 
-        lastTradeDateOrContractMonth=formatted_date, 
-        strike=strike, 
-        right=right, 
-        exchange='SMART', 
-        currency='USD'
-        )
+    # Build the strike x right cross product as flat NumPy grids
+    strikes = np.asarray(strikes)
+    grid_strikes = np.repeat(strikes, 2).tolist()
+    grid_rights = np.tile(np.array(['C', 'P']), len(strikes)).tolist()
+
+    contracts = {
+        (strike, right): Option(
+            symbol='SPX',
+            lastTradeDateOrContractMonth=formatted_date,
+            strike=strike,
+            right=right,
+            exchange='SMART',
+            currency='USD'
+            )
+        for strike, right in zip(grid_strikes, grid_rights)
+    }
+
+    # One batched qualification round trip instead of one per contract
+    ib.qualifyContracts(*contracts.values())
+
+    return contracts
+
+
+async def get_data(ib: IB, contract: Option, end_suffix: str = ' 16:00:00') -> list[list]:
+    """
+    Coroutine that returns the bid/ask prices for a 0DTE option.
+
+    Parameters
+    ----------
+    ib: Interactive brokers object
+    contract: Prebuilt (qualified) option contract
+    end_suffix: End of the interval, preformatted as ' HH:MM:SS'
+
+    Returns
+    ----------
+    List of rows of data [timestamp, strike price, right, bid, ask]
+    """
+    end_time: str = contract.lastTradeDateOrContractMonth + end_suffix
+
+    bars: list[BarData] = await ib.reqHistoricalDataAsync(contract, end_time, "3600 S", "5 secs", "BID_ASK", 1, 1, False, [])  # Historical data per hour, 5 second step size
+
+    rows: list[list] = []
+    strike = int(contract.strike)
+    right = contract.right
+
+    for bar in bars:
+        # HHMMSS000 timestamp from integer arithmetic instead of strftime + int-from-string
+        bar_date = bar.date
+        time = (bar_date.hour * 10000 + bar_date.minute * 100 + bar_date.second) * 1000
+
+        rows.append([time, strike, right, bar.low, bar.high])
+
+    return rows
+
+
+class RateLimiter:
+    """
+    Sliding-window rate limiter: allows at most max_requests requests in any
+    period-second window, waking waiters as soon as capacity frees up instead
+    of sleeping a fixed worst-case cooldown.
+    """
+    def __init__(self, max_requests: int, period: float):
+        self.max_requests = max_requests
+        self.period = period
+        self._sent: deque = deque()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+
+            # Drop request timestamps that have left the window
+            while self._sent and now - self._sent[0] >= self.period:
+                self._sent.popleft()
+
+            if len(self._sent) < self.max_requests:
+                self._sent.append(now)
+                return
+
+            # Wait only until the oldest request in the window expires
+            await asyncio.sleep(self.period - (now - self._sent[0]))
+
+
+async def process_interval(ib: IB, contracts: dict, filename: str, interval_end_time: datetime = None, limiter: RateLimiter = None, bin: bool = True, max_concurrency: int = MAX_IN_FLIGHT) -> None:
+    """
+    Coroutine that pipelines all contracts of an interval: a pool of fetch
+    workers keeps up to max_concurrency historical requests in flight
+    (a bounded submission queue), while a writer coroutine drains the
+    completed batches to disk as they arrive.  Disk writes therefore
+    overlap the remaining network waits instead of running after them.
+
+    Parameters
+    ----------
+    ib: Interactive brokers object
+    contracts: Prebuilt contracts from build_contracts
+    filename: name of file to write to
+    interval_end_time: End of the interval to fetch
+    limiter: Rate limiter shared across intervals (None for unlimited)
+    bin: True if binary file/data
+    max_concurrency: Maximum number of in-flight requests
+    """
+    completed: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # Format the interval end once here instead of once per contract
+    end_suffix = ' 16:00:00' if interval_end_time is None else interval_end_time.strftime(' %H:%M:%S')
+
+    async def fetch(contract: Option) -> None:
+        async with semaphore:
+            if limiter is not None:
+                await limiter.acquire()
+
+            rows = await get_data(ib, contract, end_suffix)
+
+        await completed.put(rows)
+
+    async def writer(nof_jobs: int) -> None:
+        for _ in range(nof_jobs):
+            rows = await completed.get()
+
+            if rows:
+                # Write in a worker thread so the flush never stalls the
+                # event loop driving the in-flight network requests
+                await asyncio.to_thread(file_write_many, rows, filename, bin)
+
+    jobs = [fetch(contract) for contract in contracts.values()]
+
+    await asyncio.gather(writer(len(jobs)), *jobs)
+
+
+# Open output file handles, keyed by filename, so each file is opened once
+# per run instead of once per row.  The sharded pipelines write from
+# asyncio.to_thread workers, so creation must be locked: two threads racing
+# past the "not in _writers" check would both open the file and both write
+# the version header, corrupting the record stream
+_writers: dict = {}
+_writers_lock = threading.Lock()
+
+def _get_writer(filename: str, bin: bool):
+    """
+    Helper function that returns a persistent file handle for the given
+    filename, opening it in append mode on first use.  Thread-safe, since
+    batches are flushed from worker threads.
+
+    Parameters
+    ----------
+    filename: name of file to write to
+    bin: True if binary file/data
+
+    Returns
+    ----------
+    Open file handle
+    """
+    with _writers_lock:
+        if filename not in _writers:
+            file = open(filename, 'ab', buffering=1<<20) if bin else open(filename, 'a', buffering=1<<20, newline='')
+
+            # New binary files start with the format version byte
+            if bin and file.tell() == 0:
+                file.write(FILE_HEADER)
+
+            _writers[filename] = file
+
+        return _writers[filename]
+
+
+def _advise_dontneed(file) -> None:
+    """
+    Helper function that tells the kernel the written pages will not be read
+    back, keeping bulk dumps from polluting the page cache.  No-op on
+    platforms without posix_fadvise.
+
+    Parameters
+    ----------
+    file: Open file handle
+    """
+    try:
+        file.flush()
+        os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+    except (AttributeError, OSError):
+        pass
+
+
+def close_writers() -> None:
+    """
+    Function that closes all persistent file handles opened by file_write.
+    """
+    for file in _writers.values():
+        file.close()
+
+    _writers.clear()
+
+
+def file_write_many(rows: list[list], filename: str, bin: bool = False) -> None:
+    """
+    Function that writes a whole batch of rows with a single write call,
+    instead of one open/pack/write per row.
+
+    Parameters
+    ----------
+    rows: List of rows of data [timestamp, strike price, right, bid, ask]
+    filename: name of file to write to
+    bin: True if binary file/data
+    """
+    file = _get_writer(filename, bin)
+
+    if bin:
+        # SoA pack: two records per row (bid then ask), one memcpy to the file
+        records = np.empty(2 * len(rows), dtype=RECORD_DTYPE)
+
+        cp_flags = [PUT_FLAG if row[2] == 'P' else 0 for row in rows]
 
-    bars: list[BarData] = ib.reqHistoricalData(contract, end_time, "3600 S", "5 secs", "BID_ASK", 1, 1, False, [])  # Historical data per hour, 5 second step size
-    ib.sleep(15)
+        records['t'][0::2] = records['t'][1::2] = [row[0] for row in rows]
+        records['flags'][0::2] = cp_flags
+        records['flags'][1::2] = np.asarray(cp_flags, dtype=np.uint8) | ASK_FLAG
+        bid_cents = np.round(np.asarray([row[3] for row in rows]) * 100)
+        ask_cents = np.round(np.asarray([row[4] for row in rows]) * 100)
 
-    for bar in bars: 
-        time = int(bar.date.strftime('%H%M%S') + '000')
+        # astype would wrap silently past the int16 ceiling; fail like the
+        # single-row pack_into path does instead of recording garbage
+        if max(np.abs(bid_cents).max(), np.abs(ask_cents).max()) > 32767:
+            raise struct.error("price in cents does not fit the int16 record field")
 
-        yield [time, int(strike), right, bar.low, bar.high]
+        records['px'][0::2] = bid_cents.astype('<i2')
+        records['px'][1::2] = ask_cents.astype('<i2')
+        records['k'][0::2] = records['k'][1::2] = [row[1] for row in rows]
 
+        file.write(records.tobytes())
+        _advise_dontneed(file)
+
+    elif not bin:
+        csv.writer(file).writerows(
+            (time, right, side, price, strike)
+            for time, strike, right, bid, ask in rows
+            for side, price in (('B', bid), ('A', ask))
+        )
+
+    else:
+        raise SyntaxError("bin must be True or False")
+
+
+# Reusable pack buffer for the single-row write path (bid + ask record)
+_ROW_BUF = bytearray(2 * RECORD_STRUCT.size)
 
 def file_write(data: list, filename: str, bin: bool = False) -> None:
     """
@@ -95,26 +325,33 @@ def file_write(data: list, filename: str, bin: bool = False) -> None:
     bin: True if binary file/data
     """
     # Unpack data
-    time, strike, right, bid, ask = data    
+    time, strike, right, bid, ask = data
+
+    file = _get_writer(filename, bin)
 
     if bin:
-        #Dictionaires for converting call/put and bid/ask to 0 and 1
-        cp = {"C": 0, "P": 1}
-        ba = {"B": 0, "A": 1}
+        # Encode call/put once for both records
+        cp_flag = PUT_FLAG if right == 'P' else 0
 
-        with open(filename, 'ab') as file:
-            file.write(struct.pack('iiifi', time, cp[right], ba['B'], bid, strike))
-            file.write(struct.pack('iiifi', time, cp[right], ba['A'], ask, strike))
+        # Pack both records into the reusable buffer and write them together
+        RECORD_STRUCT.pack_into(_ROW_BUF, 0, time, cp_flag, price_to_cents(bid), strike)
+        RECORD_STRUCT.pack_into(_ROW_BUF, RECORD_STRUCT.size, time, cp_flag | ASK_FLAG, price_to_cents(ask), strike)
+        file.write(_ROW_BUF)
 
     elif not bin:
-        with open(filename, 'a') as file:
-            file.write(f"{time},{right},'B',{bid},{strike}\n")
-            file.write(f"{time},{right},'A',{ask},{strike}\n")
+        csv.writer(file).writerows([
+            (time, right, 'B', bid, strike),
+            (time, right, 'A', ask, strike)
+        ])
 
     else:
         raise SyntaxError("bin must be True or False")
 
 
+# Computed interval lists keyed by (interval_length, time_unit, date), so the
+# schedule is only built once per trading day
+_interval_cache: dict = {}
+
 def get_time_intervals(interval_length: int, time_unit: str) -> list[datetime]:
     """
     Function that creates a list of time intervals specified by 'delta' from 9:30 AM to 4:00 PM
@@ -123,34 +360,40 @@ def get_time_intervals(interval_length: int, time_unit: str) -> list[datetime]:
     ----------
     interval_length: Time Interval
     time_unit: hours, minutes, or seconds
-    
+
     Returns
     ----------
     list of time intervals as datetime objects
     **Note: does not include 9:30**
     """
+    cache_key = (interval_length, time_unit, datetime.now().date())
+
+    if cache_key in _interval_cache:
+        return _interval_cache[cache_key]
+
     if time_unit == "hours":
-        delta = timedelta(hours=interval_length)
+        delta_s = interval_length * 3600
     elif time_unit == "minutes":
-        delta = timedelta(minutes=interval_length)
+        delta_s = interval_length * 60
     elif time_unit == "seconds":
-        delta = timedelta(seconds=interval_length)
+        delta_s = interval_length
     else:
         raise SyntaxError("time_unit must be 'hours', 'minutes', or 'seconds'")
 
     now: datetime = datetime.now()
-    current: datetime = datetime(now.year, now.month, now.day, 9, 30, 0)          # Initalize as 9:30 AM
+    start: datetime = datetime(now.year, now.month, now.day, 9, 30, 0)          # Initalize as 9:30 AM
     end: datetime = datetime(now.year, now.month, now.day, 16, 0, 0)
+    total_s = int((end - start).total_seconds())
 
-    intervals: list[datetime] = []
-
-    while current < end - delta:
-        current += delta
-        intervals.append(current)
+    # Vectorized offsets from 9:30 in delta_s steps, inclusive of 16:00
+    offsets = np.arange(delta_s, total_s + 1, delta_s)
+    intervals: list[datetime] = [start + timedelta(seconds=int(offset)) for offset in offsets]
 
-    if end not in intervals:
+    if not intervals or intervals[-1] != end:
         intervals.append(end)
 
+    _interval_cache[cache_key] = intervals
+
     return intervals
 
 
@@ -170,32 +413,21 @@ def round_to_multiple(x: float, base: int) -> int:
     return base * round(x/base)
 
 
-def create_sublist(list: list, n: int) -> list: 
-    """
-    Helper function that creates sublists of list by grouping elements in groups of 'len'
-
-    Parameters
-    ----------
-    list: list to divide into sublists
-    n: number of elements in each sublist
-
-    Returns
-    ----------
-    list of sublists
-    """
-    return [list[i:i + n] for i in range(0, len(list), n)]
-
     
-def main() -> None:
+def main(filename: str = FILENAME) -> None:
     NUM_OF_STRIKES: int = 30
 
     tik = time.time()
     start = datetime.now()
     print(f"start time = {start}")
 
-    # Connect to TWS
-    ib: IB = IB()
-    ib.connect('127.0.0.1', 7497, clientId=1)
+    # Connect to TWS, one connection per shard to lift the per-client pacing ceiling
+    ibs: list[IB] = [IB() for _ in range(NUM_OF_CONNECTIONS)]
+
+    for i, conn in enumerate(ibs):
+        conn.connect('127.0.0.1', 7497, clientId=i+1)
+
+    ib: IB = ibs[0]
 
     # Get opening price of SPX
     open_price: float = get_open_price(ib)
@@ -206,22 +438,34 @@ def main() -> None:
     print(f"SPX Opening Strike = {open_strike}")
     
     # Get strike prices to capture data from
-    strike_range: list[float] = range(open_strike - 5*NUM_OF_STRIKES, open_strike + 5*NUM_OF_STRIKES, 5)  # Strike prices to get data for (30 +/- opening value)
-    strike_iterations: list[list] = create_sublist(strike_range, 15)                                      # Sublists of 15 strikes each, due to rate limit
+    strike_range: np.ndarray = np.arange(open_strike - 5*NUM_OF_STRIKES, open_strike + 5*NUM_OF_STRIKES, 5, dtype=np.int64)  # Strike prices to get data for (30 +/- opening value)
 
     intervals = get_time_intervals(1, "hours")
 
-    for end_interval in intervals:                                              # Get data for every 1 hour in the trading day
-        for iteration in strike_iterations:                                     # 4 Groups of 15 Strikes
-            for strike in iteration:                                            # Each of the 15 Strikes
-                for right in ['C','P']:                                         # Call/Put
-                    for data in get_data(ib, strike, right, end_interval):      # Data at 15 second intervals
-                        file_write(data, FILENAME, True)
+    # Build and qualify every contract once for the whole day, then shard the
+    # contract grid across the connections
+    contracts = build_contracts(ib, strike_range)
+    contract_items = list(contracts.items())
+    shards = [dict(contract_items[i::NUM_OF_CONNECTIONS]) for i in range(NUM_OF_CONNECTIONS)]
 
-            time.sleep(240)                                                     # 10 min cooldown for rate limit every 15 strikes
+    # Same pacing budget as the old 15-strike groups with a 240 s cooldown
+    # (30 requests per 240 s) per connection, but enforced as a sliding
+    # window so work resumes the moment capacity frees up
+    limiters = [RateLimiter(30, 240) for _ in range(NUM_OF_CONNECTIONS)]
 
-    # Disconnect from IB
-    ib.disconnect()
+    for end_interval in intervals:                                              # Get data for every 1 hour in the trading day
+        # Fetch all strikes (calls and puts) concurrently across the sharded
+        # connections, writing completed batches while the rest are in flight
+        ib.run(asyncio.gather(*[
+            process_interval(conn, shard, filename, end_interval, limiter, True)
+            for conn, shard, limiter in zip(ibs, shards, limiters)
+        ]))
+
+    # Close output files and disconnect from IB
+    close_writers()
+
+    for conn in ibs:
+        conn.disconnect()
 
     end = datetime.now()
     print(f"end time = {end}")
@@ -1,16 +1,17 @@
 """
 This module serves as an example of how to decode the binary files generated by intraday.py
 """
-import struct
+import numpy as np
+from record import RECORD_DTYPE, FILE_VERSION, PUT_FLAG, ASK_FLAG
 
-#Dictionaires for converting call/put and bid/ask to 0 and 1
+#Dictionaires for converting call/put and bid/ask flags to letters
 cp = {0: "C", 1: "P"}
 ba = {0: "B", 1: "A"}
 
-def read_data_from_binary(file_path: str) -> list:
+def read_data_from_binary(file_path: str) -> np.ndarray:
     """
-    Function that reads data from the given file path and converts it to a list. 
-    Note that 0/1 = Call/Put and 0/1 = Bid/Ask.
+    Function that reads data from the given file path and converts it to a structured array.
+    Prices are stored as integer cents; flag bit 0 is Call/Put and bit 1 is Bid/Ask.
 
     Parameters
     ----------
@@ -18,37 +19,29 @@ def read_data_from_binary(file_path: str) -> list:
 
     Returns
     ----------
-    list of values in file_path where each row is [timestamp, strike price, right, bid, ask]
+    Structured array of records in file_path with fields [t, flags, px, k]
     """
-    data_list: list = []
+    with open(file_path, 'rb') as file:
+        version = file.read(1)
 
-    struct_format: str = 'iiifi'                        # Each struct (line) is [int, int, int, float, int]
-    struct_size: int = struct.calcsize(struct_format)   # Calculate bytes per struct
+    if not version or version[0] != FILE_VERSION:
+        raise ValueError(f"Unsupported file version: expected {FILE_VERSION}")
 
-    with open(file_path, 'rb') as f:
-        while True:
-            # Read a chunk of bytes corresponding to the bytes per struct
-            bytes_chunk = f.read(struct_size)
-            if not bytes_chunk:
-                break
-
-            # Unpack the bytes chunk
-            unpacked_data = struct.unpack(struct_format, bytes_chunk)
-            data_list.append(unpacked_data)
-    
-    return data_list
+    return np.fromfile(file_path, dtype=RECORD_DTYPE, offset=1)
 
 
 def main() -> None:
     # Read the data from the binary file
     file_path: str = 'intraday.bin'
-    data: list = read_data_from_binary(file_path)
+    data: np.ndarray = read_data_from_binary(file_path)
 
     # Print the data
     for line in data:
-        time, right, side, bidAskPrice, strike = line
-        print(f"Timestamp: {time}, Call/Put: {cp[right]}, Bid/Ask: {ba[side]}, Bid/Ask Price: {bidAskPrice:.2f}, Strike Price: {strike}")
+        time, flags, price_cents, strike = line
+        right = cp[flags & PUT_FLAG]
+        side = ba[(flags & ASK_FLAG) >> 1]
+        print(f"Timestamp: {time}, Call/Put: {right}, Bid/Ask: {side}, Bid/Ask Price: {price_cents/100:.2f}, Strike Price: {strike}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
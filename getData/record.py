@@ -0,0 +1,36 @@
+"""
+This module defines the binary record layout shared by intraday.py (writer)
+and read.py (reader), so the two always agree on the byte format.
+"""
+import numpy as np
+import struct
+
+# Files start with a single version byte for forward compatibility
+FILE_VERSION: int = 2
+FILE_HEADER: bytes = bytes([FILE_VERSION])
+
+# Record layout: [timestamp, flags, price in cents, strike]
+# flags bit 0: 0/1 = Call/Put, flags bit 1: 0/1 = Bid/Ask
+# Prices have 0.01 tick size and stay well under the int16 ceiling of
+# $327.67 for the strike window this pipeline captures
+RECORD_STRUCT = struct.Struct('<iBhi')
+RECORD_DTYPE = np.dtype([('t', '<i4'), ('flags', 'u1'), ('px', '<i2'), ('k', '<i4')])
+
+# Flag helpers
+PUT_FLAG: int = 1       # Bit 0 set for puts
+ASK_FLAG: int = 2       # Bit 1 set for asks
+
+
+def price_to_cents(price: float) -> int:
+    """
+    Function that converts a price in dollars to stored integer cents.
+
+    Parameters
+    ----------
+    price: Price in dollars
+
+    Returns
+    ----------
+    Price in cents
+    """
+    return int(round(price * 100))
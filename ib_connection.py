@@ -0,0 +1,62 @@
+"""
+This module manages a single shared connection to Interactive Brokers so that
+short operations do not pay the TWS handshake cost on every call.
+"""
+from ib_async import *
+import atexit
+import socket
+
+HOST: str = '127.0.0.1'
+PORT: int = 7497
+CLIENT_ID: int = 1
+
+_ib: IB = None
+
+def get_ib() -> IB:
+    """
+    Function that lazily connects to TWS and returns the shared IB object.
+    The connection is made once and reused by every caller.
+
+    Returns
+    ----------
+    Connected Interactive Brokers object
+    """
+    global _ib
+
+    if _ib is None:
+        _ib = IB()
+
+    if not _ib.isConnected():
+        _ib.connect(HOST, PORT, clientId=CLIENT_ID)
+        _enable_tcp_nodelay(_ib)
+
+    return _ib
+
+
+def _enable_tcp_nodelay(ib: IB) -> None:
+    """
+    Helper function that disables Nagle's algorithm on the TWS socket so small
+    messages are sent immediately.
+
+    Parameters
+    ----------
+    ib: Interactive brokers object
+    """
+    try:
+        sock = ib.client.conn.transport.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except (AttributeError, OSError):
+        pass    # Transport does not expose the raw socket, nothing to do
+
+
+def disconnect() -> None:
+    """
+    Function that disconnects the shared connection (called automatically at exit).
+    """
+    global _ib
+
+    if _ib is not None and _ib.isConnected():
+        _ib.disconnect()
+
+atexit.register(disconnect)
@@ -2,14 +2,20 @@
 This module contains a function (order_combo_profit_taker) to order a multi-leg
 combo position and attach a stop loss order.
 """
-from ib_insync import *
+from ib_async import *
 from datetime import date
+from ib_connection import get_ib
+from pathlib import Path
+import asyncio
+import atexit
+import copy
+import dbm
+import functools
+import shelve
 
-# Dictonary that maps to the opposite action (BUY -> SELL, SELL -> BUY)
-OPPOSITE = {
-    'BUY': 'SELL',
-    'SELL': 'BUY'
-}
+# Throttles concurrent order submissions below TWS's ~50 messages/second
+# pacing limit, so bursts queue locally instead of triggering retries
+ORDER_SEMAPHORE = asyncio.Semaphore(40)
 
 def place_orders(ib: IB, contract: Contract, orders: list[Order]) -> int:
     """
@@ -26,15 +32,26 @@ def place_orders(ib: IB, contract: Contract, orders: list[Order]) -> int:
     Parent order ID
     """
     parent_order = orders[0]
-    parent_trade = ib.placeOrder(contract, parent_order)
-    ib.sleep()
 
-    for order in orders[0:]:
-        order.parentId = parent_trade.order.orderId
-        parent_trade = ib.placeOrder(contract, order)
-        ib.sleep()
+    # Standard bracket submission: TWS holds the orders until the last one
+    # arrives with transmit=True, then activates them atomically
+    for order in orders[:-1]:
+        order.transmit = False
+
+    orders[-1].transmit = True
+
+    # Take the next order ID locally so the children can reference the parent
+    # before anything is sent, removing the readback round trip
+    parent_id = ib.client.getReqId()
+    parent_order.orderId = parent_id
+
+    for order in orders[1:]:
+        order.parentId = parent_id
 
-    return parent_trade.order.orderId
+    for order in orders:
+        ib.placeOrder(contract, order)
+
+    return parent_id
 
 
 def create_order(order_type: str, action: str, nof_lot: int, limit_price: float = None, stop_price: float = None) -> Order:
@@ -58,61 +75,292 @@ def create_order(order_type: str, action: str, nof_lot: int, limit_price: float
         totalQuantity = nof_lot
     )   
 
-    if order_type == 'MKT':
-        order.orderType = 'MKT'
-    elif order_type == 'LMT':
-        order.orderType = 'LMT'
-        order.lmtPrice = assign_if_not_none(limit_price, 'limit_price', order_type)
-    elif order_type == 'STP':
-        order.orderType = 'STP'
-        order.auxPrice = assign_if_not_none(stop_price, 'limit_price', order_type)
-    elif order_type == 'STP LMT':
-        order.orderType = 'STP LMT'
-        order.auxPrice = assign_if_not_none(stop_price, 'limit_price', order_type)
-        order.lmtPrice = assign_if_not_none(limit_price, 'limit_price', order_type)
-    else:
+    try:
+        _SETTERS[order_type](order, limit_price, stop_price)
+    except KeyError:
         raise SyntaxError("Order type must be MKT, LMT, STP, or STP LMT")
 
     return order
 
 
-def assign_if_not_none(x: float, variable_name: str, order_type: str) -> float:
+def _set_mkt(order: Order, limit_price: float, stop_price: float) -> None:
+    """Setter for MKT orders."""
+    order.orderType = 'MKT'
+
+
+def _set_lmt(order: Order, limit_price: float, stop_price: float) -> None:
+    """Setter for LMT orders."""
+    if limit_price is None:
+        raise SyntaxError("limit_price cannot be empty for LMT order")
+
+    order.orderType = 'LMT'
+    order.lmtPrice = limit_price
+
+
+def _set_stp(order: Order, limit_price: float, stop_price: float) -> None:
+    """Setter for STP orders."""
+    if stop_price is None:
+        raise SyntaxError("stop_price cannot be empty for STP order")
+
+    order.orderType = 'STP'
+    order.auxPrice = stop_price
+
+
+def _set_stp_lmt(order: Order, limit_price: float, stop_price: float) -> None:
+    """Setter for STP LMT orders."""
+    if stop_price is None:
+        raise SyntaxError("stop_price cannot be empty for STP LMT order")
+
+    if limit_price is None:
+        raise SyntaxError("limit_price cannot be empty for STP LMT order")
+
+    order.orderType = 'STP LMT'
+    order.auxPrice = stop_price
+    order.lmtPrice = limit_price
+
+
+# Dispatch table mapping order type to its price setter, so create_order does
+# one hash lookup instead of walking an if/elif chain
+_SETTERS = {
+    'MKT': _set_mkt,
+    'LMT': _set_lmt,
+    'STP': _set_stp,
+    'STP LMT': _set_stp_lmt
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _expiration_str(day_ord: int) -> str:
     """
-    Function that raises a SyntaxError if 'x' is None, error message says variable_name cannot be empty for order_type
-    
+    Helper function that formats the 0DTE expiration date for the given day
+    ordinal.  Memoized with maxsize=1 so the strftime runs once per calendar
+    day instead of once per order.
+
     Parameters
     ----------
-    x: value to check if it is None
-    variable_name: name of variable (used only for error messsage)
-    order_type: order type (used only for error messsage)
-    
+    day_ord: Ordinal of the date, from date.today().toordinal()
+
     Returns
     ----------
-    x if not None
+    Date formatted as 'YYYYMMDD'
     """
-    if x is not None:
-        return x
-    else:
-        raise SyntaxError(f"{variable_name} cannot be empty for {order_type} order")
+    return date.fromordinal(day_ord).strftime('%Y%m%d')
+
 
+# On-disk copy of the conId cache, so re-running a script on the same day
+# skips qualification entirely
+_CACHE_PATH = Path.home() / '.spxw_conid.db'
 
-def get_contract(ib: IB, strike: float, right: str) -> Option:
+def _load_conid_cache() -> dict[tuple, int]:
     """
-    Helper function that qualifies and returns the SPXW 0DTE contract with the given strike and right.
+    Helper function that loads today's conId entries from the on-disk cache.
+    Entries from earlier days are left behind, which invalidates them.
+
+    Returns
+    ----------
+    Dict mapping (strike, right, expiration) to conId
+    """
+    today = _expiration_str(date.today().toordinal())
+
+    # dbm.error is a (dbm.error, OSError) tuple, so this also catches the
+    # corrupt-file case; degrade to an empty cache instead of failing the import
+    try:
+        with shelve.open(str(_CACHE_PATH)) as db:
+            return dict(db.get(today, {}))
+    except dbm.error:
+        return {}
+
+
+def _save_conid_cache() -> None:
+    """
+    Helper function that flushes today's conId entries back to the on-disk
+    cache.  Registered with atexit.
+    """
+    today = _expiration_str(date.today().toordinal())
+    entries = {key: conid for key, conid in _conid_cache.items() if key[2] == today}
+
+    if not entries:
+        return
+
+    try:
+        with shelve.open(str(_CACHE_PATH)) as db:
+            db[today] = entries
+    except dbm.error:
+        pass
+
+
+# Qualified conIds keyed by (strike, right, expiration); repeat legs hit the
+# dict instead of the IB socket and the cache rolls over at midnight
+_conid_cache: dict[tuple, int] = _load_conid_cache()
+atexit.register(_save_conid_cache)
+
+def prime_condor_grid(ib: IB, center: float, half_width: float = 50, step: int = 5) -> None:
+    """
+    Function that qualifies the whole 0DTE strike grid around the given
+    center in one warm-up round trip, so later leg lookups are pure cache
+    hits and the order-placement path never waits on TWS.
+
+    Parameters
+    ----------
+    ib: Interactive brokers object
+    center: Center of the grid, usually the current SPX price rounded to a strike
+    half_width: Points covered on each side of the center - default 50
+    step: Distance between strikes - default 5
+    """
+    strikes = range(int(center - half_width), int(center + half_width) + step, step)
+
+    get_conids(ib, [(strike, right) for strike in strikes for right in ('P', 'C')])
+
+# Day the full SPXW chain was last fetched into the conId cache
+_chain_primed_on: str = None
+
+def _prime_chain(ib: IB, day_str: str) -> None:
+    """
+    Helper function that fetches the whole SPXW chain for the given expiration
+    in a single reqContractDetails call (strike 0 matches every strike) and
+    fills the conId cache from the response.
+
+    Parameters
+    ----------
+    ib: Interactive brokers object
+    day_str: Expiration date as 'YYYYMMDD'
+    """
+    global _chain_primed_on
+
+    details = ib.reqContractDetails(Option('SPXW', day_str, 0, '', 'SMART', tradingClass='SPXW'))
+
+    for detail in details:
+        contract = detail.contract
+        _conid_cache.setdefault((contract.strike, contract.right, day_str), contract.conId)
+
+    _chain_primed_on = day_str
+
+
+def get_conids(ib: IB, legs: list[tuple]) -> list[int]:
+    """
+    Helper function that returns the conIds of the SPXW 0DTE contracts with the
+    given strikes and rights.  Unresolved legs are qualified in one batched
+    round trip to TWS and cached for the rest of the day.
+
+    Parameters
+    ----------
+    ib: Interactive brokers object
+    legs: List of (strike, right) tuples
+
+    Returns
+    ----------
+    List of conIds, in the same order as the legs
+    """
+    day_str = _expiration_str(date.today().toordinal())
+    keys = [(strike, right, day_str) for strike, right in legs]
+
+    # One bulk chain fetch per day replaces per-strike qualification; any
+    # strike missing from the chain still falls back to qualifyContracts
+    if _chain_primed_on != day_str and any(key not in _conid_cache for key in keys):
+        _prime_chain(ib, day_str)
+
+    needed = [key for key in dict.fromkeys(keys) if key not in _conid_cache]
+
+    if needed:
+        contracts = [Option('SPXW', day, strike, right, 'SMART', tradingClass='SPXW') for strike, right, day in needed]
+        ib.qualifyContracts(*contracts)
+
+        # qualifyContracts leaves conId at 0 on a contract it could not
+        # resolve; don't cache (or persist) that, so the next call retries
+        for key, contract in zip(needed, contracts):
+            if contract.conId:
+                _conid_cache[key] = contract.conId
+
+    return [_conid_cache.get(key, 0) for key in keys]
+
+
+async def get_conids_async(ib: IB, legs: list[tuple]) -> list[int]:
+    """
+    Coroutine version of get_conids for async order paths.  Shares the same
+    conId cache; unresolved legs are qualified with qualifyContractsAsync so
+    the event loop stays free while TWS answers.
+
+    Parameters
+    ----------
+    ib: Interactive brokers object
+    legs: List of (strike, right) tuples
+
+    Returns
+    ----------
+    List of conIds, in the same order as the legs
+    """
+    global _chain_primed_on
+
+    day_str = _expiration_str(date.today().toordinal())
+    keys = [(strike, right, day_str) for strike, right in legs]
+
+    # One bulk chain fetch per day replaces per-strike qualification; any
+    # strike missing from the chain still falls back to qualifyContracts
+    if _chain_primed_on != day_str and any(key not in _conid_cache for key in keys):
+        details = await ib.reqContractDetailsAsync(Option('SPXW', day_str, 0, '', 'SMART', tradingClass='SPXW'))
+
+        for detail in details:
+            contract = detail.contract
+            _conid_cache.setdefault((contract.strike, contract.right, day_str), contract.conId)
+
+        _chain_primed_on = day_str
+
+    needed = [key for key in dict.fromkeys(keys) if key not in _conid_cache]
+
+    if needed:
+        contracts = [Option('SPXW', day, strike, right, 'SMART', tradingClass='SPXW') for strike, right, day in needed]
+        await ib.qualifyContractsAsync(*contracts)
+
+        # qualifyContracts leaves conId at 0 on a contract it could not
+        # resolve; don't cache (or persist) that, so the next call retries
+        for key, contract in zip(needed, contracts):
+            if contract.conId:
+                _conid_cache[key] = contract.conId
+
+    return [_conid_cache.get(key, 0) for key in keys]
+
+
+def get_conid(ib: IB, strike: float, right: str) -> int:
+    """
+    Helper function that returns the conId of the SPXW 0DTE contract with the given strike and right.
 
     Parameters
     ----------
     ib: Interactive brokers object
     strike: Strike price of the option
     right: 'P' or 'C'
+
+    Returns
+    ----------
+    conId of the qualified contract
     """
-    contract: Option = Option('SPXW', date.today().strftime('%Y%m%d'), strike, right, 'SMART', tradingClass='SPXW')
-    ib.qualifyContracts(contract)
+    return get_conids(ib, [(strike, right)])[0]
 
-    return contract
 
+@functools.lru_cache(maxsize=256)
+def _build_bag(legs_key: tuple) -> Bag:
+    """
+    Helper function that builds the SPX combo Bag for the given legs.  The
+    Bag is fully determined by its (conId, action) pairs, so repeat orders
+    on the same strikes reuse the cached contract.
 
-def order_combo_profit_taker(*legs: tuple, action: str, nof_lot: int, order_type: str, limit_price: float = None, stop_price: float = None, stop_loss_type: str = None, stop_loss_limit_price: float = None, stop_loss_stop_price: float = None, profit_taker_limit: str = None) -> int:
+    Parameters
+    ----------
+    legs_key: Sorted tuple of (conId, action) pairs
+
+    Returns
+    ----------
+    Bag contract with the combo legs attached
+    """
+    return Bag(
+        symbol = 'SPX',
+        currency = 'USD',
+        exchange = 'SMART',
+        comboLegs = [ComboLeg(conId=conid, ratio=1, action=action, exchange='SMART') for conid, action in legs_key]
+    )
+
+
+def order_combo_profit_taker(*legs: tuple, action: str, nof_lot: int, order_type: str, limit_price: float = None, stop_price: float = None, stop_loss_type: str = None, stop_loss_limit_price: float = None, stop_loss_stop_price: float = None, profit_taker_limit: str = None, ib: IB = None) -> int:
     """
     Submits an combo spread order with stop loss and/or profit taker and returns the order ID.
     Stop loss can be stop or stop limit and profit taker is limit.
@@ -129,25 +377,26 @@ def order_combo_profit_taker(*legs: tuple, action: str, nof_lot: int, order_type
     stop_loss_limit_price: stop loss order's limit price (when stop_loss_type is STP LMT) - default None
     stop_loss_stop_price: stop loss order's stop price (when stop_loss_type is STP or STP LMT) - default None
     profit_taker_limit: profit taker's limit price - default None
+    ib: Interactive Brokers object - default None; the shared connection is used if not given
     
     Returns
     ----------
     Order ID of the placed order
     """
-    # Connect to IB
-    ib = IB()
-    ib.connect('127.0.0.1', 7497, clientId=1)
+    # Use the shared IB connection unless one was passed in
+    if ib is None:
+        ib = get_ib()
+
+    # Opposite action for the closing child orders, computed once
+    opp_action = 'SELL' if action == 'BUY' else 'BUY'
 
-    combo_legs = [ComboLeg(conId=get_contract(ib, leg[0], leg[2]).conId, ratio=1, action=leg[1], exchange='SMART') for leg in legs]
+    conids = get_conids(ib, [(leg[0], leg[2]) for leg in legs])
     orders = []
 
-    # Combo contract
-    combo = Bag(
-        symbol = 'SPX',
-        currency = 'USD',
-        exchange = 'SMART',
-        comboLegs = combo_legs    
-    )
+    # Combo contract, from the cache when the same strikes repeat; copied so
+    # placeOrder never mutates the cached original
+    legs_key = tuple(sorted(zip(conids, (leg[1] for leg in legs))))
+    combo = copy.copy(_build_bag(legs_key))
     
     # Create the parent order
     parent_order = create_order(order_type, action, nof_lot, limit_price, stop_price)
@@ -156,14 +405,14 @@ def order_combo_profit_taker(*legs: tuple, action: str, nof_lot: int, order_type
     # Create the stop loss order if it exists
     if stop_loss_type:
         if stop_loss_type not in ['STP', 'STP LMT']: raise SyntaxError("Stop loss type must be STP or STP LMT")
-        stop_loss_order = create_order(stop_loss_type, OPPOSITE[action], nof_lot, stop_loss_limit_price, stop_loss_stop_price)
+        stop_loss_order = create_order(stop_loss_type, opp_action, nof_lot, stop_loss_limit_price, stop_loss_stop_price)
         stop_loss_order.parentId = parent_order.orderId
         orders.append(stop_loss_order)
 
     # Create the profit taker order if it exists
     if profit_taker_limit:
         profit_taker_order = LimitOrder(
-            action = OPPOSITE[action],
+            action = opp_action,
             totalQuantity = nof_lot,
             lmtPrice = profit_taker_limit
         )
@@ -173,8 +422,6 @@ def order_combo_profit_taker(*legs: tuple, action: str, nof_lot: int, order_type
     # Place Orders
     order_id = place_orders(ib, combo, orders)
 
-    ib.disconnect()
-
     return order_id
 
 
@@ -10,28 +10,88 @@ and stop limit price.
 # short_put_strike: 100
 # long_put_strike: 90
 """
-from ib_insync import *
-from datetime import date
+from ib_async import *
+import functools
+import logging
+import copy
 from find_spreads import get_spreads
+from ib_connection import get_ib
+from order_combo import ORDER_SEMAPHORE, get_conids_async, place_orders
 
-def get_contract(ib: IB, strike: float, right: str) -> Option:
+logger = logging.getLogger(__name__)
+
+# Combo contract template: everything but the legs is constant for SPXW
+# condors, so each order copies this instead of setting the fields again
+_COMBO_TEMPLATE = Contract(symbol='SPX', secType='BAG', currency='USD', exchange='SMART')
+
+async def _build_condor_combo(ib: IB, call_spread: tuple[float], put_spread: tuple[float]) -> Contract:
     """
-    Helper function that qualifies and returns the SPXW 0DTE contract with the given strike and right.
+    Coroutine that turns the call and put spreads into a ready-to-place SPXW
+    condor combo.  With a warm conId cache this is a few dict lookups, four
+    ComboLegs and a template copy.
 
     Parameters
     ----------
     ib: Interactive brokers object
-    strike: Strike price of the option
-    right: 'P' or 'C'
+    call_spread: tuple of call spread strike prices
+    put_spread: tuple of put spread strike prices
+
+    Returns
+    ----------
+    BAG contract with the four condor legs attached
+    """
+    # Unpack strike prices; put strikes sit below call strikes in a valid
+    # condor, so a min/max per wing replaces the sort of all four
+    assert max(put_spread[:2]) < min(call_spread[:2]), "Put strikes must be below call strikes"
+
+    long_put_strike, short_put_strike = min(put_spread[:2]), max(put_spread[:2])
+    short_call_strike, long_call_strike = min(call_spread[:2]), max(call_spread[:2])
+
+    # Leg spec as data: (strike, right, action), wings bought and body sold
+    spec = [
+        (long_call_strike, 'C', 'BUY'),
+        (short_call_strike, 'C', 'SELL'),
+        (short_put_strike, 'P', 'SELL'),
+        (long_put_strike, 'P', 'BUY')
+    ]
+
+    # Resolve all four legs in one batched request instead of four round trips
+    conids = await get_conids_async(ib, [(strike, right) for strike, right, _ in spec])
+
+    legs = [ComboLeg(conId=conid, ratio=1, action=action, exchange='SMART')
+            for conid, (_, _, action) in zip(conids, spec)]
+
+    # Combo order contract from the prebuilt template
+    combo = copy.copy(_COMBO_TEMPLATE)
+    combo.comboLegs = legs
+
+    return combo
+
+
+def make_condor_builder(ib: IB = None):
     """
-    contract: Option = Option('SPXW', date.today().strftime('%Y%m%d'), strike, right, 'SMART', tradingClass='SPXW')
-    ib.qualifyContracts(contract)
+    Factory that returns _build_condor_combo with the connection baked in, so
+    strategy loops can build condor after condor without re-passing ib.
 
-    return contract
+    Parameters
+    ----------
+    ib: Interactive Brokers object - default None; the shared connection is used if not given
 
-def order_condor(call_spread: tuple[float], put_spread: tuple[float], nof_lot: int, stop_trigger_price: float, stop_limit_price: float, stop_loss_trigger_price: float, stop_loss_limit_price: float = None) -> int:
+    Returns
+    ----------
+    Coroutine function mapping (call_spread, put_spread) to a combo Contract
     """
-    Submits an combo spread order with stop loss and returns the order ID.
+    if ib is None:
+        ib = get_ib()
+
+    return functools.partial(_build_condor_combo, ib)
+
+
+async def order_condor_async(call_spread: tuple[float], put_spread: tuple[float], nof_lot: int, stop_trigger_price: float, stop_limit_price: float, stop_loss_trigger_price: float, stop_loss_limit_price: float = None, ib: IB = None) -> int:
+    """
+    Coroutine that submits an combo spread order with stop loss and returns
+    the order ID.  Several condors can be placed concurrently on one
+    connection by gathering this coroutine.
 
     Parameters
     ----------
@@ -42,32 +102,17 @@ def order_condor(call_spread: tuple[float], put_spread: tuple[float], nof_lot: i
     stop_limit_price: parent order's limit price
     stop_loss_trigger_price: stop loss's trigger price
     stop_loss_limit_price: stop loss's limit price - default None; set if you want the stop loss to be a stop limit order
+    ib: Interactive Brokers object - default None; the shared connection is used if not given
     
     Returns
     ----------
     Order ID of the placed order
     """
-    # Connect to IB
-    ib = IB()
-    ib.connect('127.0.0.1', 7497, clientId=12)
-
-    # Unpack strike prices
-    long_put_strike, short_put_strike, short_call_strike, long_call_strike = sorted(call_spread[:2] + put_spread[:2])
-
-    legs = [
-        ComboLeg(conId=get_contract(ib, long_call_strike, 'C').conId, ratio=1, action='BUY', exchange='SMART'), 
-        ComboLeg(conId=get_contract(ib, short_call_strike, 'C').conId, ratio=1, action='SELL', exchange='SMART'),
-        ComboLeg(conId=get_contract(ib, short_put_strike, 'P').conId, ratio=1, action='SELL', exchange='SMART'),
-        ComboLeg(conId=get_contract(ib, long_put_strike, 'P').conId, ratio=1, action='BUY', exchange='SMART')
-    ]
+    # Use the shared IB connection unless one was passed in
+    if ib is None:
+        ib = get_ib()
 
-    # Combo order contract
-    combo = Contract()
-    combo.symbol = 'SPX'
-    combo.secType = 'BAG'
-    combo.currency = 'USD'
-    combo.exchange = 'SMART'
-    combo.comboLegs = legs
+    combo = await _build_condor_combo(ib, call_spread, put_spread)
 
     # Define the parent combo order (buy for credit stop limit)
     parent_order = StopLimitOrder(
@@ -92,27 +137,45 @@ def order_condor(call_spread: tuple[float], put_spread: tuple[float], nof_lot: i
             stopPrice = stop_loss_trigger_price
         )
 
-    # Attach the stop loss order to the parent order
-    stop_loss_order.parentId = parent_order.orderId
+    # Submit parent and stop loss as one bracket: the parent ID is assigned
+    # locally and TWS activates both orders atomically on the final transmit
+    async with ORDER_SEMAPHORE:
+        order_id = place_orders(ib, combo, [parent_order, stop_loss_order])
+    logger.debug("order ID = %d", order_id)
 
-    # Place the parent order
-    parent_trade = ib.placeOrder(combo, parent_order)
-    ib.sleep()
-    
-    # Get the parent order ID and place the stop loss order
-    stop_loss_order.parentId = parent_trade.order.orderId
-    ib.placeOrder(combo, stop_loss_order)
+    return order_id
 
-    order_id = parent_trade.order.orderId
-    print(f"order ID = {order_id}")
 
-    ib.disconnect()
+def order_condor(call_spread: tuple[float], put_spread: tuple[float], nof_lot: int, stop_trigger_price: float, stop_limit_price: float, stop_loss_trigger_price: float, stop_loss_limit_price: float = None, ib: IB = None) -> int:
+    """
+    Submits an combo spread order with stop loss and returns the order ID.
+    Synchronous wrapper around order_condor_async.
 
-    return order_id
+    Parameters
+    ----------
+    call_spread: tuple of call spread strike prices
+    put_spread: tuple of put spread strike prices
+    nof_lot: number of lots to order
+    stop_trigger_price: parent order's stop price
+    stop_limit_price: parent order's limit price
+    stop_loss_trigger_price: stop loss's trigger price
+    stop_loss_limit_price: stop loss's limit price - default None; set if you want the stop loss to be a stop limit order
+    ib: Interactive Brokers object - default None; the shared connection is used if not given
+    
+    Returns
+    ----------
+    Order ID of the placed order
+    """
+    if ib is None:
+        ib = get_ib()
+
+    return ib.run(order_condor_async(call_spread, put_spread, nof_lot, stop_trigger_price, stop_limit_price, stop_loss_trigger_price, stop_loss_limit_price, ib))
 
 
 ## For testing:
 def main() -> None:
+    logging.basicConfig(level=logging.DEBUG)
+
 #    call_spread, put_spread = get_spreads(width=10, time="3:30", entry_credit=1, nof_lot=1)
 
  #   if call_spread is None or put_spread is None:
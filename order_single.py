@@ -2,32 +2,20 @@
 This module contains a function (order_single) to order a 
 single 0DTE limit, stop, or stop limit option contract
 """
-from ib_insync import *
+from ib_async import *
+import logging
 from datetime import date
+from ib_connection import get_ib
+from order_combo import ORDER_SEMAPHORE, create_order, _expiration_str
 
-def assign_if_not_none(x: float, variable_name: str, order_type: str) -> float:
-    """
-    Function that raises a SyntaxError if 'x' is None, error message says variable_name cannot be empty for order_type
-    
-    Parameters
-    ----------
-    x: value to check if it is None
-    variable_name: name of variable (used only for error messsage)
-    order_type: order type (used only for error messsage)
-    
-    Returns
-    ----------
-    x if not None
-    """
-    if x is not None:
-        return x
-    else:
-        raise SyntaxError(f"{variable_name} cannot be empty for {order_type} order")
+logger = logging.getLogger(__name__)
 
 
-def order_single(action: str, nof_lot: int, strike: float, right: str, order_type: str, limit_price: float = None, stop_price: float = None) -> int:
+async def order_single_async(action: str, nof_lot: int, strike: float, right: str, order_type: str, limit_price: float = None, stop_price: float = None, ib: IB = None) -> int:
     """
-    Submits a order for a SPX option and returns the order ID.
+    Coroutine that submits a order for a SPX option and returns the order ID.
+    Several orders can be placed concurrently on one connection by gathering
+    this coroutine.
 
     Parameters
     ----------
@@ -37,67 +25,69 @@ def order_single(action: str, nof_lot: int, strike: float, right: str, order_typ
     order_type: 'MKT', 'LMT', 'STP', or 'STP LMT'
     limit_price: order's stop price (when order_type is LMT or STP LMT) - default None
     stop_price: order's limit price (when order_type is STP or STP LMT) - default None
+    ib: Interactive Brokers object - default None; the shared connection is used if not given
     
     Returns
     ----------
     Order ID of the placed order
     """
-    # Connect to IB
-    ib = IB()
-    ib.connect('127.0.0.1', 7497, clientId=1)
+    # Use the shared IB connection unless one was passed in
+    if ib is None:
+        ib = get_ib()
 
     # Create option contract
     contract = Option(
         symbol = 'SPXW',
-        lastTradeDateOrContractMonth = date.today().strftime('%Y%m%d'),
+        lastTradeDateOrContractMonth = _expiration_str(date.today().toordinal()),
         strike = strike,
         right = right,
         exchange = 'SMART',
         tradingClass = 'SPXW'
     )
 
-    # Create the order
-    order = Order(
-        action = action,
-        totalQuantity = nof_lot
-    )
-
-    # Add the trigger and limit prices based on order type
-    if order_type == 'MKT':
-        order.orderType = 'MKT'
-
-    elif order_type == 'LMT':
-        order.orderType = 'LMT'
-        order.lmtPrice = assign_if_not_none(limit_price, 'limit_price', order_type)
+    # Create the order (trigger and limit prices set based on order type)
+    order = create_order(order_type, action, nof_lot, limit_price, stop_price)
 
-    elif order_type == 'STP':
-        order.orderType = 'STP'
-        order.auxPrice = assign_if_not_none(stop_price, 'stop_price', order_type)
+    # Place the parent order; the order ID is assigned locally, so there is
+    # nothing to wait for before reading it back
+    async with ORDER_SEMAPHORE:
+        trade = ib.placeOrder(contract, order)
 
-    elif order_type == 'STP LMT':
-        order.orderType = 'STP LMT'
-        order.auxPrice = assign_if_not_none(stop_price, 'stop_price', order_type)
-        order.lmtPrice = assign_if_not_none(limit_price, 'limit_price', order_type)
-        
-    else:
-        raise SyntaxError("Order type must be LMT, STP, or STP LMT")
+    order_id = trade.order.orderId
+    logger.debug("order ID = %d", order_id)
 
-    # Place the parent order
-    trade = ib.placeOrder(contract, order)
+    return order_id
 
-    # Keep the connection open until orders are filled
-    ib.sleep()
 
-    order_id = trade.order.orderId
-    print(f"order ID = {order_id}")
+def order_single(action: str, nof_lot: int, strike: float, right: str, order_type: str, limit_price: float = None, stop_price: float = None, ib: IB = None) -> int:
+    """
+    Submits a order for a SPX option and returns the order ID.
+    Synchronous wrapper around order_single_async.
 
-    ib.disconnect()
+    Parameters
+    ----------
+    action: 'BUY' or 'SELL'
+    strike_price: strike price of option
+    right: 'C' or 'P'
+    order_type: 'MKT', 'LMT', 'STP', or 'STP LMT'
+    limit_price: order's stop price (when order_type is LMT or STP LMT) - default None
+    stop_price: order's limit price (when order_type is STP or STP LMT) - default None
+    ib: Interactive Brokers object - default None; the shared connection is used if not given
+    
+    Returns
+    ----------
+    Order ID of the placed order
+    """
+    if ib is None:
+        ib = get_ib()
 
-    return order_id
+    return ib.run(order_single_async(action, nof_lot, strike, right, order_type, limit_price, stop_price, ib))
 
 
 ## For testing:
 def main() -> None:
+    logging.basicConfig(level=logging.DEBUG)
+
     order_single('BUY', 1, 5435, 'C', 'STP', 1, 3)
 
 if __name__ == '__main__':